@@ -16,6 +16,39 @@ class Settings:
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
     UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
     
+    # 공간 스타일 추가 설정 파일 (JSON, 비어 있으면 기본 스타일만 사용)
+    SPACE_STYLES_FILE: str = os.getenv("SPACE_STYLES_FILE", "")
+    
+    # WebSocket 메시지 제한 설정
+    WS_MAX_MESSAGE_SIZE: int = int(os.getenv("WS_MAX_MESSAGE_SIZE", "4096"))
+    # 연결 전체 한도 (초당 메시지 수, 버스트 크기)
+    WS_RATE_LIMIT: float = float(os.getenv("WS_RATE_LIMIT", "30"))
+    WS_RATE_BURST: float = float(os.getenv("WS_RATE_BURST", "60"))
+    # 메시지 타입별 한도
+    WS_MOVE_RATE_LIMIT: float = float(os.getenv("WS_MOVE_RATE_LIMIT", "20"))
+    WS_MOVE_RATE_BURST: float = float(os.getenv("WS_MOVE_RATE_BURST", "40"))
+    WS_CHAT_RATE_LIMIT: float = float(os.getenv("WS_CHAT_RATE_LIMIT", "2"))
+    WS_CHAT_RATE_BURST: float = float(os.getenv("WS_CHAT_RATE_BURST", "5"))
+    WS_JOIN_RATE_LIMIT: float = float(os.getenv("WS_JOIN_RATE_LIMIT", "1"))
+    WS_JOIN_RATE_BURST: float = float(os.getenv("WS_JOIN_RATE_BURST", "3"))
+    WS_RESYNC_RATE_LIMIT: float = float(os.getenv("WS_RESYNC_RATE_LIMIT", "1"))
+    WS_RESYNC_RATE_BURST: float = float(os.getenv("WS_RESYNC_RATE_BURST", "3"))
+    
+    # WebSocket 송신 설정
+    # 배칭을 선택한 연결에서 메시지를 모아 보내는 시간 (밀리초)
+    WS_BATCH_WINDOW_MS: float = float(os.getenv("WS_BATCH_WINDOW_MS", "5"))
+    # 압축을 선택한 연결에서 이 크기(바이트) 이상인 프레임만 deflate 압축
+    WS_COMPRESSION_THRESHOLD: int = int(os.getenv("WS_COMPRESSION_THRESHOLD", "1024"))
+    # 전송 계층 permessage-deflate 확장 사용 여부 (uvicorn 설정, 모든 프레임에 적용)
+    # 클라이언트와 협상된 연결에서는 ?compress 요청을 무시 (두 압축 방식은 동시에 사용하지 않음)
+    WS_PER_MESSAGE_DEFLATE: bool = os.getenv("WS_PER_MESSAGE_DEFLATE", "True").lower() == "true"
+    
+    # WebSocket 하트비트 설정 (초)
+    # 이 시간 동안 수신이 없으면 ping 전송
+    WS_HEARTBEAT_INTERVAL: float = float(os.getenv("WS_HEARTBEAT_INTERVAL", "15"))
+    # 이 시간 동안 수신이 없으면 연결 정리
+    WS_IDLE_TIMEOUT: float = float(os.getenv("WS_IDLE_TIMEOUT", "45"))
+    
     # 서버 설정
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
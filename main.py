@@ -8,11 +8,14 @@ import os
 from typing import List, Dict
 import asyncio
 
+from config import settings
 from database import engine, Base
 from models import User, Space
 from schemas import UserCreate, UserResponse, SpaceCreate, SpaceResponse
 from services import UserService, SpaceService, ImageService
 from websocket_manager import ConnectionManager
+from websocket_protocol import prevalidate_frame, validate_message, error_message, deflate_negotiated
+from rate_limiter import MessageRateLimiter
 
 # 데이터베이스 테이블 생성
 Base.metadata.create_all(bind=engine)
@@ -32,13 +35,38 @@ app.add_middleware(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # WebSocket 연결 관리자
-manager = ConnectionManager()
+manager = ConnectionManager(
+    batch_window=settings.WS_BATCH_WINDOW_MS / 1000,
+    compress_threshold=settings.WS_COMPRESSION_THRESHOLD,
+    heartbeat_interval=settings.WS_HEARTBEAT_INTERVAL,
+    idle_timeout=settings.WS_IDLE_TIMEOUT,
+)
+
+# WebSocket 메시지 속도 제한
+rate_limiter = MessageRateLimiter(
+    connection_limit=(settings.WS_RATE_LIMIT, settings.WS_RATE_BURST),
+    type_limits={
+        "move": (settings.WS_MOVE_RATE_LIMIT, settings.WS_MOVE_RATE_BURST),
+        "chat": (settings.WS_CHAT_RATE_LIMIT, settings.WS_CHAT_RATE_BURST),
+        "join_space": (settings.WS_JOIN_RATE_LIMIT, settings.WS_JOIN_RATE_BURST),
+        "resync": (settings.WS_RESYNC_RATE_LIMIT, settings.WS_RESYNC_RATE_BURST),
+    },
+)
+manager.add_disconnect_listener(rate_limiter.remove)
 
 # 서비스 인스턴스
 user_service = UserService()
 space_service = SpaceService()
 image_service = ImageService()
 
+@app.on_event("startup")
+async def start_heartbeat():
+    manager.start_heartbeat()
+
+@app.on_event("shutdown")
+async def stop_heartbeat():
+    manager.stop_heartbeat()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to MyMetaVerse API"}
@@ -85,31 +113,86 @@ async def upload_image(file: UploadFile = File(...)):
         "message": "Image uploaded and analyzed successfully"
     }
 
+@app.get("/ws/stats")
+async def websocket_stats():
+    return {
+        "connections": manager.get_connection_count(),
+        "rate_limit": rate_limiter.get_stats(),
+        "protocol": manager.protocol_stats.get_stats(),
+        "heartbeat": manager.get_heartbeat_stats(),
+    }
+
 # WebSocket 연결
 @app.websocket("/ws/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, user_id: int):
-    await manager.connect(websocket, user_id)
+async def websocket_endpoint(websocket: WebSocket, user_id: int, batch: bool = False, compress: bool = False):
+    # 전송 계층 permessage-deflate가 협상된 연결은 이미 압축되므로 애플리케이션 압축은 사용하지 않음
+    extensions = websocket.headers.get("sec-websocket-extensions", "")
+    if deflate_negotiated(extensions, settings.WS_PER_MESSAGE_DEFLATE):
+        compress = False
+    await manager.connect(websocket, user_id, batch=batch, compress=compress)
     try:
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
+            # 전송 실패, 유휴 정리, 재접속으로 이 소켓이 정리되었으면 수신 루프 종료
+            if manager.active_connections.get(user_id) is not websocket:
+                break
+            # 어떤 메시지든 수신되면 살아있는 연결로 간주 (pong 포함)
+            manager.touch(user_id)
+            
+            # JSON 파싱 전 크기/타입 검사 후 속도 제한 (팬아웃 전에 초과 부하 차단)
+            message_type, error = prevalidate_frame(data, settings.WS_MAX_MESSAGE_SIZE)
+            if error is not None:
+                rate_limiter.record_rejected(error)
+                # 잘못된 메시지 폭주에도 응답이 증폭되지 않도록 한도 내에서만 오류 전송
+                if rate_limiter.allow(user_id, "invalid"):
+                    await manager.send_personal_message(error_message(error), user_id)
+                continue
+            
+            if not rate_limiter.allow(user_id, message_type):
+                continue
+            
+            try:
+                message = json.loads(data)
+            except (ValueError, RecursionError):
+                # 깊게 중첩된 JSON은 크기 제한 안에서도 RecursionError 발생
+                message = None
+            error = validate_message(message, message_type)
+            if error is not None:
+                rate_limiter.record_rejected(error)
+                await manager.send_personal_message(error_message(error), user_id)
+                continue
             
             # 메시지 타입에 따른 처리
-            if message["type"] == "join_space":
+            if message_type == "join_space":
                 await manager.join_space(user_id, message["space_id"])
-            elif message["type"] == "chat":
+            elif message_type == "leave_space":
+                await manager.leave_space(user_id)
+            elif message_type == "resync":
+                await manager.send_roster(user_id, message["space_id"])
+            elif message_type == "chat":
                 await manager.broadcast_to_space(
                     message["space_id"], 
                     {"type": "chat", "user_id": user_id, "message": message["message"]}
                 )
-            elif message["type"] == "move":
+            elif message_type == "move":
                 await manager.broadcast_to_space(
                     message["space_id"],
                     {"type": "move", "user_id": user_id, "position": message["position"]}
                 )
                 
     except WebSocketDisconnect:
+        pass
+    finally:
+        # 예상치 못한 예외로 종료되어도 모든 인덱스에서 정리
         manager.disconnect(websocket, user_id)
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        ws_per_message_deflate=settings.WS_PER_MESSAGE_DEFLATE,
+        # 크기 제한을 넘는 프레임은 버퍼링 전에 전송 계층에서 거부
+        ws_max_size=settings.WS_MAX_MESSAGE_SIZE,
+    )
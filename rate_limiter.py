@@ -0,0 +1,104 @@
+import time
+from typing import Dict, Optional, Tuple
+
+
+class TokenBucket:
+    """토큰 버킷 (초당 rate 개 충전, 최대 capacity 개 보관)"""
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def consume(self, now: float, amount: float = 1.0) -> bool:
+        """토큰을 소비할 수 있으면 True"""
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+
+class MessageRateLimiter:
+    """연결별 / 메시지 타입별 토큰 버킷 관리"""
+
+    def __init__(
+        self,
+        connection_limit: Tuple[float, float],
+        type_limits: Dict[str, Tuple[float, float]],
+    ):
+        # (초당 허용 개수, 버스트 크기)
+        self.connection_limit = connection_limit
+        self.type_limits = type_limits
+
+        # 사용자별 버킷: 전체 버킷 + 타입별 버킷
+        self.connection_buckets: Dict[int, TokenBucket] = {}
+        self.type_buckets: Dict[int, Dict[str, TokenBucket]] = {}
+
+        # 스로틀링 카운터
+        self.allowed_count = 0
+        self.throttled_count = 0
+        self.throttled_by_type: Dict[str, int] = {}
+        self.throttled_by_user: Dict[int, int] = {}
+
+        # 검증 실패로 버려진 메시지 카운터
+        self.rejected_by_reason: Dict[str, int] = {}
+
+    def allow(self, user_id: int, message_type: str, now: Optional[float] = None) -> bool:
+        """메시지 처리 허용 여부 판단"""
+        if now is None:
+            now = time.monotonic()
+
+        # 타입별 한도를 먼저 확인해야 한 타입의 폭주가 전체 버킷을 소진하지 않음
+        type_limit = self.type_limits.get(message_type)
+        if type_limit is not None:
+            buckets = self.type_buckets.setdefault(user_id, {})
+            bucket = buckets.get(message_type)
+            if bucket is None:
+                bucket = buckets[message_type] = TokenBucket(type_limit[0], type_limit[1], now)
+            if not bucket.consume(now):
+                self._record_throttle(user_id, message_type)
+                return False
+
+        bucket = self.connection_buckets.get(user_id)
+        if bucket is None:
+            bucket = self.connection_buckets[user_id] = TokenBucket(
+                self.connection_limit[0], self.connection_limit[1], now
+            )
+        if not bucket.consume(now):
+            self._record_throttle(user_id, message_type)
+            return False
+
+        self.allowed_count += 1
+        return True
+
+    def _record_throttle(self, user_id: int, message_type: str):
+        self.throttled_count += 1
+        self.throttled_by_type[message_type] = self.throttled_by_type.get(message_type, 0) + 1
+        self.throttled_by_user[user_id] = self.throttled_by_user.get(user_id, 0) + 1
+
+    def record_rejected(self, reason: str):
+        """검증에 실패한 메시지 기록"""
+        self.rejected_by_reason[reason] = self.rejected_by_reason.get(reason, 0) + 1
+
+    def remove(self, user_id: int):
+        """연결 해제된 사용자의 버킷 정리"""
+        self.connection_buckets.pop(user_id, None)
+        self.type_buckets.pop(user_id, None)
+        self.throttled_by_user.pop(user_id, None)
+
+    def get_stats(self) -> dict:
+        """스로틀링 통계 반환"""
+        return {
+            "allowed": self.allowed_count,
+            "throttled": self.throttled_count,
+            "throttled_by_type": dict(self.throttled_by_type),
+            "throttled_by_user": dict(self.throttled_by_user),
+            "rejected_by_reason": dict(self.rejected_by_reason),
+        }
@@ -0,0 +1,357 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+from sqlalchemy import func, select, update
+
+from config import settings
+from database import SessionLocal
+from models import Space
+from services import ImageService
+
+# 작업 프로세스마다 한 번만 생성하는 이미지 서비스
+_worker_service: Optional[ImageService] = None
+
+
+def _init_worker(nice: int):
+    """작업 프로세스 우선순위를 낮춰 서비스 트래픽을 방해하지 않도록 함"""
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+
+
+def reanalyze_image(image_path: str) -> Optional[dict]:
+    """이미지 재분석 (실패 시 기본값으로 덮어쓰지 않도록 None 반환)"""
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = ImageService()
+
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    try:
+        return _worker_service.analyze_image_array(image)
+    except Exception as e:
+        print(f"Error analyzing image {image_path}: {e}")
+        return None
+
+
+def resolve_image_path(image_url: str, upload_dir: str) -> Optional[str]:
+    """image_url을 로컬 파일 경로로 변환 (파일이 없으면 None)"""
+    if os.path.isfile(image_url):
+        return image_url
+    candidate = os.path.join(upload_dir, os.path.basename(image_url))
+    if os.path.isfile(candidate):
+        return candidate
+    return None
+
+
+def merge_space_data(old_space_data, analysis: dict) -> dict:
+    """기존 행이 저장한 형태를 유지하며 새 분석 결과 반환"""
+    # 3D 공간 데이터만 저장한 행이면 같은 형태로 기록
+    if isinstance(old_space_data, dict) and "walls" in old_space_data:
+        return analysis["space_data"]
+    return analysis
+
+
+class ReanalysisAborted(RuntimeError):
+    """한 번도 성공하지 못한 채 분석이 계속 실패하여 작업을 중단함 (환경 문제로 전체 행이 실패 처리되는 것을 방지)"""
+
+
+class SpaceReanalysisJob:
+    """기존 공간의 이미지를 재분석하여 space_data를 갱신하는 재개 가능한 작업"""
+
+    def __init__(
+        self,
+        chunk_size: int = 200,
+        workers: Optional[int] = None,
+        max_rate: Optional[float] = None,
+        checkpoint_path: Optional[str] = "reanalyze_checkpoint.json",
+        nice: int = 10,
+        upload_dir: str = settings.UPLOAD_DIR,
+        progress_callback: Optional[Callable[[dict], None]] = None,
+        max_initial_failures: int = 50,
+    ):
+        self.chunk_size = chunk_size
+        # 0이면 프로세스 풀 없이 현재 프로세스에서 분석
+        self.workers = max(1, (os.cpu_count() or 2) // 2) if workers is None else workers
+        # 초당 처리할 최대 공간 수 (None이면 제한 없음)
+        self.max_rate = max_rate
+        self.checkpoint_path = checkpoint_path
+        self.nice = nice
+        self.upload_dir = upload_dir
+        self.progress_callback = progress_callback
+        # 이번 실행에서 한 번도 성공하지 못한 채 이만큼 실패하면 체크포인트를 진행시키지 않고 중단
+        # (개별 이미지 불량이 아닌 분석 환경 문제로 판단)
+        self.max_initial_failures = max_initial_failures
+        self.failure_streak = 0
+        self.succeeded = False
+
+        self.stop_event = threading.Event()
+        self.progress = self.load_checkpoint()
+
+    def load_checkpoint(self) -> dict:
+        """체크포인트 파일에서 진행 상황 읽기"""
+        progress = {"last_id": 0, "processed": 0, "updated": 0, "missing": 0, "failed_ids": []}
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                progress.update(json.load(f))
+        return progress
+
+    def save_checkpoint(self):
+        """진행 상황 저장 (중간에 중단되어도 파일이 깨지지 않도록 교체 방식으로 기록)"""
+        if not self.checkpoint_path:
+            return
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.progress, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def clear_checkpoint(self):
+        """체크포인트 파일 삭제"""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def reset(self):
+        """체크포인트를 지우고 처음부터 다시 시작"""
+        self.clear_checkpoint()
+        self.progress = self.load_checkpoint()
+
+    def stop(self):
+        """현재 청크를 마친 뒤 작업 중단"""
+        self.stop_event.set()
+
+    def _remaining_query(self):
+        return select(Space.id, Space.image_url, Space.space_data).where(
+            Space.image_url.isnot(None), Space.id > self.progress["last_id"]
+        )
+
+    def fetch_chunk(self, db) -> List:
+        """마지막 처리 ID 이후의 다음 청크 조회 (서버 측 커서로 스트리밍)"""
+        stmt = (
+            self._remaining_query()
+            .order_by(Space.id)
+            .limit(self.chunk_size)
+            .execution_options(stream_results=True, yield_per=self.chunk_size)
+        )
+        return list(db.execute(stmt))
+
+    def count_remaining(self, db) -> int:
+        stmt = select(func.count()).select_from(self._remaining_query().subquery())
+        return db.execute(stmt).scalar_one()
+
+    def analyze_rows(
+        self, rows: List, executor: Optional[ProcessPoolExecutor], abort_on_failures: bool = True
+    ) -> Tuple[List[dict], List[int], int]:
+        """행들을 분석하여 (UPDATE 파라미터, 실패한 ID, 이미지 없는 행 수) 반환"""
+        pending = []
+        missing = 0
+        for row in rows:
+            image_path = resolve_image_path(row.image_url, self.upload_dir)
+            if image_path is None:
+                missing += 1
+            else:
+                pending.append((row, image_path))
+
+        paths = [image_path for _, image_path in pending]
+        if executor is not None:
+            results = list(executor.map(reanalyze_image, paths))
+        else:
+            results = [reanalyze_image(path) for path in paths]
+
+        updates = []
+        failed_ids = []
+        for (row, _), analysis in zip(pending, results):
+            if analysis is None:
+                failed_ids.append(row.id)
+                if not abort_on_failures:
+                    continue
+                self.failure_streak += 1
+                if not self.succeeded and self.failure_streak >= self.max_initial_failures:
+                    raise ReanalysisAborted(
+                        f"{self.failure_streak}개 공간의 분석이 한 번도 성공하지 못하고 실패했습니다 (마지막 ID {row.id}). "
+                        "분석 환경을 확인한 뒤 다시 실행하면 체크포인트부터 재개합니다."
+                    )
+            else:
+                self.succeeded = True
+                self.failure_streak = 0
+                updates.append({"id": row.id, "space_data": merge_space_data(row.space_data, analysis)})
+
+        return updates, failed_ids, missing
+
+    def write_updates(self, db, updates: List[dict]):
+        """분석 결과를 한 번의 배치 UPDATE로 기록"""
+        if updates:
+            db.execute(update(Space), updates)
+            db.commit()
+        self.progress["updated"] += len(updates)
+
+    def process_chunk(self, db, rows: List, executor: Optional[ProcessPoolExecutor]) -> int:
+        """청크를 분석하고 결과 기록 (중단되면 이 청크는 기록하지 않아 다시 처리됨)"""
+        updates, failed_ids, missing = self.analyze_rows(rows, executor)
+        self.write_updates(db, updates)
+
+        # 실패한 행은 체크포인트에 남겨 본 처리 이후 다시 시도
+        self.progress["failed_ids"].extend(failed_ids)
+        self.progress["missing"] += missing
+        self.progress["processed"] += len(rows)
+        self.progress["last_id"] = rows[-1].id
+        return len(updates)
+
+    def retry_failed(self, db, executor: Optional[ProcessPoolExecutor]):
+        """실패했던 행을 한 번 더 분석 (계속 실패한 ID만 남김)
+
+        모두 이전에 실패한 행이므로 실패가 이어지는 것이 정상이어서 중단 조건은 적용하지 않는다.
+        """
+        self.failure_streak = 0
+        failed_ids = self.progress["failed_ids"]
+        still_failed = []
+        for start in range(0, len(failed_ids), self.chunk_size):
+            if self.stop_event.is_set():
+                still_failed.extend(failed_ids[start:])
+                break
+            ids = failed_ids[start:start + self.chunk_size]
+            rows = list(db.execute(
+                select(Space.id, Space.image_url, Space.space_data).where(Space.id.in_(ids)).order_by(Space.id)
+            ))
+            db.rollback()
+
+            updates, failed, missing = self.analyze_rows(rows, executor, abort_on_failures=False)
+            self.write_updates(db, updates)
+            still_failed.extend(failed)
+            self.progress["missing"] += missing
+
+        self.progress["failed_ids"] = still_failed
+        self.save_checkpoint()
+
+    def run(self) -> dict:
+        """모든 대상 공간을 재분석 (중단 후 다시 실행하면 체크포인트부터 재개)
+
+        끝까지 처리하면 체크포인트를 삭제하므로 다음 실행은 새 마이그레이션으로 처음부터 시작한다.
+        """
+        self.stop_event.clear()
+        self.failure_streak = 0
+        self.succeeded = False
+        executor = None
+        if self.workers > 0:
+            # 서버 프로세스 안(run_async)에서도 안전하도록 fork 대신 spawn 사용
+            executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.nice,),
+            )
+
+        db = SessionLocal()
+        started_at = time.monotonic()
+        processed_at_start = self.progress["processed"]
+        completed = False
+        try:
+            total = self.progress["processed"] + self.count_remaining(db)
+            while not self.stop_event.is_set():
+                chunk_started_at = time.monotonic()
+                rows = self.fetch_chunk(db)
+                # 읽기 트랜잭션을 오래 유지하지 않도록 분석 전에 종료
+                db.rollback()
+                if not rows:
+                    break
+
+                self.process_chunk(db, rows, executor)
+                self.save_checkpoint()
+
+                elapsed = time.monotonic() - started_at
+                processed = self.progress["processed"] - processed_at_start
+                self._report({
+                    **self.progress,
+                    "total": total,
+                    "elapsed": round(elapsed, 1),
+                    "rate": round(processed / elapsed, 2) if elapsed > 0 else 0.0,
+                })
+
+                # 초당 처리량 제한
+                if self.max_rate:
+                    min_duration = len(rows) / self.max_rate
+                    wait = min_duration - (time.monotonic() - chunk_started_at)
+                    if wait > 0:
+                        self.stop_event.wait(wait)
+
+            if not self.stop_event.is_set():
+                if self.progress["failed_ids"]:
+                    self.retry_failed(db, executor)
+                completed = not self.stop_event.is_set()
+        finally:
+            db.close()
+            if executor is not None:
+                executor.shutdown()
+
+        result = {**self.progress, "completed": completed}
+        if completed:
+            self.clear_checkpoint()
+            self.progress = self.load_checkpoint()
+        return result
+
+    async def run_async(self) -> dict:
+        """서버 이벤트 루프를 막지 않도록 별도 스레드에서 실행"""
+        return await asyncio.to_thread(self.run)
+
+    def _report(self, progress: dict):
+        if self.progress_callback is not None:
+            self.progress_callback(progress)
+
+
+def print_progress(progress: dict):
+    print(
+        f"[{progress['processed']}/{progress['total']}] "
+        f"updated={progress['updated']} failed={len(progress['failed_ids'])} missing={progress['missing']} "
+        f"last_id={progress['last_id']} rate={progress['rate']}/s elapsed={progress['elapsed']}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="기존 공간의 이미지를 재분석하여 space_data 갱신")
+    parser.add_argument("--chunk-size", type=int, default=200, help="한 번에 조회/갱신할 공간 수")
+    parser.add_argument("--workers", type=int, default=None, help="분석 프로세스 수 (0이면 현재 프로세스에서 실행)")
+    parser.add_argument("--max-rate", type=float, default=None, help="초당 처리할 최대 공간 수")
+    parser.add_argument("--checkpoint", default="reanalyze_checkpoint.json", help="체크포인트 파일 경로")
+    parser.add_argument("--nice", type=int, default=10, help="작업 프로세스 nice 값")
+    parser.add_argument("--reset", action="store_true", help="체크포인트를 무시하고 처음부터 실행")
+    args = parser.parse_args()
+
+    job = SpaceReanalysisJob(
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        max_rate=args.max_rate,
+        checkpoint_path=args.checkpoint,
+        nice=args.nice,
+        progress_callback=print_progress,
+    )
+    if args.reset:
+        job.reset()
+
+    try:
+        result = job.run()
+    except KeyboardInterrupt:
+        print(f"중단되었습니다. 다시 실행하면 {args.checkpoint}에 저장된 위치부터 재개합니다.")
+        return
+    except ReanalysisAborted as e:
+        print(f"작업을 중단했습니다: {e}")
+        sys.exit(1)
+
+    if not result["completed"]:
+        print(f"중지되었습니다. 다시 실행하면 {args.checkpoint}에 저장된 위치부터 재개합니다.")
+        return
+
+    if result["failed_ids"]:
+        print(f"다시 시도해도 분석에 실패한 공간 ID: {result['failed_ids']}")
+    print(f"완료: {json.dumps(result, ensure_ascii=False)}")
+
+
+if __name__ == "__main__":
+    main()
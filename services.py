@@ -2,13 +2,15 @@ from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import User, Space, Message
 from schemas import UserCreate, SpaceCreate, ImageAnalysisResult
+from config import settings
+from space_rules import SpaceRuleEngine, hex_to_rgb, rgb_to_hex, warm_color_mask
 from passlib.context import CryptContext
 import cv2
 import numpy as np
 from PIL import Image
 import os
 import uuid
-from typing import List, Optional
+from typing import List, Optional, Union
 import json
 
 # 비밀번호 해싱
@@ -92,6 +94,11 @@ class ImageService:
     def __init__(self):
         self.upload_dir = "uploads"
         self.ensure_upload_dir()
+        
+        # 스타일/조명/가구 규칙 테이블 (설정 파일로 스타일 추가 가능)
+        self.rule_engine = SpaceRuleEngine()
+        if settings.SPACE_STYLES_FILE:
+            self.rule_engine.load_styles_file(settings.SPACE_STYLES_FILE)
     
     def ensure_upload_dir(self):
         if not os.path.exists(self.upload_dir):
@@ -118,29 +125,7 @@ class ImageService:
             if image is None:
                 raise ValueError("이미지를 로드할 수 없습니다")
             
-            # 색상 분석
-            dominant_colors = self.extract_dominant_colors(image)
-            
-            # 분위기 분석
-            mood = self.analyze_mood(image)
-            
-            # 객체 감지 (간단한 버전)
-            objects_detected = self.detect_objects(image)
-            
-            # 공간 스타일 결정
-            space_style = self.determine_space_style(dominant_colors, mood)
-            
-            # 조명 설정
-            lighting = self.determine_lighting(mood)
-            
-            return {
-                "dominant_colors": dominant_colors,
-                "mood": mood,
-                "objects_detected": objects_detected,
-                "space_style": space_style,
-                "lighting": lighting,
-                "space_data": self.generate_space_data(space_style, dominant_colors, lighting)
-            }
+            return self.analyze_image_array(image)
             
         except Exception as e:
             # 오류 발생 시 기본값 반환
@@ -153,8 +138,39 @@ class ImageService:
                 "space_data": self.generate_default_space_data()
             }
     
+    def analyze_image_array(self, image: np.ndarray) -> dict:
+        """로드된 이미지 분석 (실패 시 기본값 대신 예외 발생)"""
+        # 색상 분석 (규칙 판단은 숫자 배열로, 응답에는 HEX로)
+        color_array = self.extract_dominant_color_array(image)
+        dominant_colors = rgb_to_hex(color_array)
+        
+        # 분위기 분석
+        mood = self.analyze_mood(image)
+        
+        # 객체 감지 (간단한 버전)
+        objects_detected = self.detect_objects(image)
+        
+        # 공간 스타일 결정
+        space_style = self.determine_space_style(color_array, mood)
+        
+        # 조명 설정
+        lighting = self.determine_lighting(mood)
+        
+        return {
+            "dominant_colors": dominant_colors,
+            "mood": mood,
+            "objects_detected": objects_detected,
+            "space_style": space_style,
+            "lighting": lighting,
+            "space_data": self.generate_space_data(space_style, dominant_colors, lighting)
+        }
+    
     def extract_dominant_colors(self, image: np.ndarray) -> List[str]:
         """이미지에서 주요 색상 추출"""
+        return rgb_to_hex(self.extract_dominant_color_array(image))
+    
+    def extract_dominant_color_array(self, image: np.ndarray) -> np.ndarray:
+        """이미지에서 주요 색상을 (3, 3) RGB 배열로 추출"""
         # 이미지를 RGB로 변환
         image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         
@@ -169,13 +185,7 @@ class ImageService:
         # 클러스터 중심을 색상으로 변환
         colors = kmeans.cluster_centers_.astype(int)
         
-        # RGB를 HEX로 변환
-        hex_colors = []
-        for color in colors:
-            hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
-            hex_colors.append(hex_color)
-        
-        return hex_colors[:3]  # 상위 3개 색상만 반환
+        return colors[:3]  # 상위 3개 색상만 반환
     
     def analyze_mood(self, image: np.ndarray) -> str:
         """이미지 분위기 분석"""
@@ -215,83 +225,29 @@ class ImageService:
         
         return objects
     
-    def determine_space_style(self, colors: List[str], mood: str) -> str:
-        """색상과 분위기를 바탕으로 공간 스타일 결정"""
-        if "bright" in mood:
-            if any(self.is_warm_color(color) for color in colors):
-                return "modern_warm"
-            else:
-                return "modern_minimal"
-        else:
-            if any(self.is_warm_color(color) for color in colors):
-                return "cozy_rustic"
-            else:
-                return "industrial"
+    def determine_space_style(self, colors: Union[List[str], np.ndarray], mood: str) -> str:
+        """색상(HEX 목록 또는 RGB 배열)과 분위기를 바탕으로 공간 스타일 결정"""
+        color_array = np.asarray(colors)
+        if color_array.dtype.kind in ("U", "S", "O"):
+            color_array = hex_to_rgb(colors)
+        return self.rule_engine.classify(color_array.reshape(1, -1, 3), [mood])[0]
     
     def is_warm_color(self, hex_color: str) -> bool:
         """따뜻한 색상인지 판단"""
-        # HEX를 RGB로 변환
-        r = int(hex_color[1:3], 16)
-        g = int(hex_color[3:5], 16)
-        b = int(hex_color[5:7], 16)
-        
-        # 빨간색과 주황색 성분이 많으면 따뜻한 색상
-        return r > g and r > b
+        return bool(warm_color_mask(hex_to_rgb([hex_color]))[0])
     
     def determine_lighting(self, mood: str) -> str:
         """분위기에 따른 조명 설정"""
-        if "bright" in mood:
-            return "bright"
-        else:
-            return "dim"
+        return self.rule_engine.determine_lighting(mood)
     
     def generate_space_data(self, style: str, colors: List[str], lighting: str) -> dict:
         """공간 스타일에 따른 3D 공간 데이터 생성"""
-        base_space = {
-            "walls": {
-                "material": "concrete",
-                "color": colors[0] if colors else "#ffffff"
-            },
-            "floor": {
-                "material": "wood",
-                "color": colors[1] if len(colors) > 1 else "#8B4513"
-            },
-            "ceiling": {
-                "material": "concrete",
-                "color": "#ffffff"
-            },
-            "lighting": {
-                "type": lighting,
-                "intensity": 1.0 if lighting == "bright" else 0.3
-            },
-            "furniture": []
-        }
-        
-        # 스타일에 따른 가구 추가
-        if "modern" in style:
-            base_space["furniture"] = [
-                {"type": "sofa", "position": [0, 0, -2], "color": colors[0]},
-                {"type": "coffee_table", "position": [0, 0, -1], "color": "#8B4513"},
-                {"type": "lamp", "position": [2, 1, -2], "color": "#FFD700"}
-            ]
-        elif "cozy" in style:
-            base_space["furniture"] = [
-                {"type": "armchair", "position": [0, 0, -2], "color": "#8B4513"},
-                {"type": "fireplace", "position": [0, 0, -3], "color": "#696969"},
-                {"type": "bookshelf", "position": [3, 0, 0], "color": "#8B4513"}
-            ]
-        
-        return base_space
+        return self.rule_engine.render(style, colors, lighting)
+    
+    def build_space_data_batch(self, colors: np.ndarray, moods: List[str]) -> List[dict]:
+        """(n, k, 3) 색상 배열과 분위기 목록으로 여러 공간 데이터를 한 번에 생성"""
+        return self.rule_engine.build_batch(colors, moods)
     
     def generate_default_space_data(self) -> dict:
         """기본 공간 데이터"""
-        return {
-            "walls": {"material": "concrete", "color": "#ffffff"},
-            "floor": {"material": "wood", "color": "#8B4513"},
-            "ceiling": {"material": "concrete", "color": "#ffffff"},
-            "lighting": {"type": "bright", "intensity": 1.0},
-            "furniture": [
-                {"type": "sofa", "position": [0, 0, -2], "color": "#87CEEB"},
-                {"type": "coffee_table", "position": [0, 0, -1], "color": "#8B4513"}
-            ]
-        }
+        return self.rule_engine.render_default()
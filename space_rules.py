@@ -0,0 +1,251 @@
+import json
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 스타일 판단에 사용하는 특징 (규칙의 "when" 조건 키)
+FEATURES = ("bright", "vibrant", "warm")
+
+# 템플릿에서 사용할 수 있는 "$이름" 파라미터
+TEMPLATE_PARAMETERS = frozenset({"primary", "secondary", "lighting", "intensity"})
+
+# 조명 종류별 밝기
+LIGHTING_INTENSITY: Dict[str, float] = {"bright": 1.0, "dim": 0.3}
+
+# 모든 스타일의 기본 공간 문서 ("$이름"은 렌더링 시 채워지는 값)
+BASE_TEMPLATE: Dict[str, Any] = {
+    "walls": {"material": "concrete", "color": "$primary"},
+    "floor": {"material": "wood", "color": "$secondary"},
+    "ceiling": {"material": "concrete", "color": "#ffffff"},
+    "lighting": {"type": "$lighting", "intensity": "$intensity"},
+    "furniture": [],
+}
+
+MODERN_FURNITURE = [
+    {"type": "sofa", "position": (0, 0, -2), "color": "$primary"},
+    {"type": "coffee_table", "position": (0, 0, -1), "color": "#8B4513"},
+    {"type": "lamp", "position": (2, 1, -2), "color": "#FFD700"},
+]
+
+COZY_FURNITURE = [
+    {"type": "armchair", "position": (0, 0, -2), "color": "#8B4513"},
+    {"type": "fireplace", "position": (0, 0, -3), "color": "#696969"},
+    {"type": "bookshelf", "position": (3, 0, 0), "color": "#8B4513"},
+]
+
+# 기본 스타일 규칙 (위에서부터 처음 일치하는 규칙 적용)
+DEFAULT_STYLES: List[Dict[str, Any]] = [
+    {"name": "modern_warm", "when": {"bright": True, "warm": True}, "template": {"furniture": MODERN_FURNITURE}},
+    {"name": "modern_minimal", "when": {"bright": True}, "template": {"furniture": MODERN_FURNITURE}},
+    {"name": "cozy_rustic", "when": {"warm": True}, "template": {"furniture": COZY_FURNITURE}},
+    {"name": "industrial", "when": {}, "template": {}},
+]
+
+# 분석 실패 시 사용하는 기본 공간
+DEFAULT_SPACE_TEMPLATE: Dict[str, Any] = {
+    "furniture": [
+        {"type": "sofa", "position": (0, 0, -2), "color": "#87CEEB"},
+        {"type": "coffee_table", "position": (0, 0, -1), "color": "#8B4513"},
+    ],
+}
+
+
+def _freeze(value: Any, path: str) -> Any:
+    """섹션 값을 불변 형태로 변환 (리스트는 튜플로, json.dumps는 튜플을 리스트로 출력)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item, f"{path}[{index}]") for index, item in enumerate(value))
+    if isinstance(value, str) and value.startswith("$"):
+        raise ValueError(f"파라미터는 섹션의 최상위 값에만 사용할 수 있습니다: {path}")
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise ValueError(f"지원하지 않는 템플릿 값입니다: {path}")
+
+
+def _compile_section(document: Mapping[str, Any], path: str) -> Tuple[Mapping[str, Any], Tuple[Tuple[str, str], ...]]:
+    """섹션을 읽기 전용 매핑과 "$이름" 자리 목록 (필드, 파라미터)으로 컴파일"""
+    if not isinstance(document, Mapping):
+        raise ValueError(f"템플릿 섹션은 객체여야 합니다: {path}")
+
+    frozen = {}
+    slots = []
+    for key, value in document.items():
+        if isinstance(value, str) and value.startswith("$"):
+            name = value[1:]
+            if name not in TEMPLATE_PARAMETERS:
+                raise ValueError(f"알 수 없는 템플릿 파라미터입니다: {path}.{key} = {value}")
+            slots.append((key, name))
+            frozen[key] = value
+        else:
+            frozen[key] = _freeze(value, f"{path}.{key}")
+    return MappingProxyType(frozen), tuple(slots)
+
+
+class SpaceTemplate:
+    """미리 컴파일된 불변 공간 문서 템플릿
+
+    렌더링 시 각 섹션을 얕은 복사한 뒤 미리 찾아둔 자리만 채운다.
+    섹션은 MappingProxyType, 리스트 값은 튜플로 저장하므로 결과를 수정해도 템플릿은 바뀌지 않는다.
+    """
+
+    def __init__(self, document: Mapping[str, Any]):
+        sections = []
+        furniture = ()
+        for key, value in document.items():
+            if key == "furniture":
+                if not isinstance(value, (list, tuple)):
+                    raise ValueError("furniture는 목록이어야 합니다")
+                furniture = tuple(
+                    _compile_section(item, f"furniture[{index}]") for index, item in enumerate(value)
+                )
+            else:
+                frozen, slots = _compile_section(value, key)
+                sections.append((key, frozen, slots))
+
+        self.sections: Tuple[Tuple[str, Mapping[str, Any], Tuple[Tuple[str, str], ...]], ...] = tuple(sections)
+        self.furniture: Tuple[Tuple[Mapping[str, Any], Tuple[Tuple[str, str], ...]], ...] = furniture
+
+    def render(self, params: Dict[str, Any]) -> dict:
+        """파라미터를 채운 공간 데이터 생성"""
+        space = {}
+        for key, section, slots in self.sections:
+            rendered = dict(section)
+            for field, name in slots:
+                rendered[field] = params[name]
+            space[key] = rendered
+
+        furniture = []
+        for item, slots in self.furniture:
+            rendered = dict(item)
+            for field, name in slots:
+                rendered[field] = params[name]
+            furniture.append(rendered)
+        space["furniture"] = furniture
+        return space
+
+
+def rgb_to_hex(colors: np.ndarray) -> List[str]:
+    """(k, 3) RGB 배열을 HEX 문자열 목록으로 변환"""
+    return [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in np.asarray(colors, dtype=int).tolist()]
+
+
+def hex_to_rgb(colors: Sequence[str]) -> np.ndarray:
+    """HEX 문자열 목록을 (k, 3) RGB 배열로 변환"""
+    rgb = [(int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)) for color in colors]
+    return np.array(rgb, dtype=int).reshape(-1, 3)
+
+
+def warm_color_mask(colors: np.ndarray) -> np.ndarray:
+    """빨간색 성분이 가장 큰 색상이면 True (마지막 축이 RGB)"""
+    colors = np.asarray(colors)
+    r, g, b = colors[..., 0], colors[..., 1], colors[..., 2]
+    return (r > g) & (r > b)
+
+
+class SpaceRuleEngine:
+    """데이터 기반 공간 스타일 규칙 테이블"""
+
+    def __init__(self, styles: Optional[List[Dict[str, Any]]] = None):
+        self.names: List[str] = []
+        self.templates: Dict[str, SpaceTemplate] = {}
+        # 규칙별 특징 조건: required는 조건이 있는 특징, expected는 기대값
+        self.required = np.zeros((0, len(FEATURES)), dtype=bool)
+        self.expected = np.zeros((0, len(FEATURES)), dtype=bool)
+        # 알 수 없는 스타일은 가구 없는 기본 문서로 렌더링
+        self.base_template = SpaceTemplate(BASE_TEMPLATE)
+        self.default_template = SpaceTemplate({**BASE_TEMPLATE, **DEFAULT_SPACE_TEMPLATE})
+
+        for style in DEFAULT_STYLES if styles is None else styles:
+            self.add_style(style)
+
+    def add_style(self, style: Dict[str, Any], first: bool = False):
+        """스타일 규칙 추가 (first=True면 기존 규칙보다 먼저 검사)"""
+        name = style.get("name")
+        when = style.get("when", {})
+        template = style.get("template", {})
+        if not isinstance(name, str) or not name:
+            raise ValueError(f"스타일 이름이 필요합니다: {style}")
+        if not isinstance(when, dict) or not isinstance(template, dict):
+            raise ValueError(f"스타일의 when과 template은 객체여야 합니다: {name}")
+        unknown = set(when) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"알 수 없는 스타일 조건입니다: {sorted(unknown)}")
+
+        # 템플릿 검증이 실패하면 규칙 테이블을 바꾸지 않도록 먼저 컴파일
+        compiled = SpaceTemplate({**BASE_TEMPLATE, **template})
+
+        required = np.array([feature in when for feature in FEATURES], dtype=bool)
+        expected = np.array([bool(when.get(feature, False)) for feature in FEATURES], dtype=bool)
+        position = 0 if first else len(self.names)
+
+        self.names.insert(position, name)
+        self.required = np.insert(self.required, position, required, axis=0)
+        self.expected = np.insert(self.expected, position, expected, axis=0)
+        self.templates[name] = compiled
+
+    def load_styles_file(self, path: str):
+        """JSON 설정 파일의 스타일을 기본 규칙보다 우선하도록 추가 (잘못된 설정은 로드 시 ValueError)"""
+        with open(path, "r", encoding="utf-8") as f:
+            styles = json.load(f)
+        if not isinstance(styles, list):
+            raise ValueError(f"스타일 설정 파일은 목록이어야 합니다: {path}")
+        # 파일에 적힌 순서대로 우선순위를 유지
+        for style in reversed(styles):
+            if not isinstance(style, dict):
+                raise ValueError(f"스타일 항목은 객체여야 합니다: {style}")
+            self.add_style(style, first=True)
+
+    def compute_features(self, colors: np.ndarray, moods: Sequence[str]) -> np.ndarray:
+        """(n, k, 3) 색상 배열과 분위기 목록에서 (n, 특징 수) 불리언 행렬 생성"""
+        bright = np.fromiter(("bright" in mood for mood in moods), dtype=bool, count=len(moods))
+        vibrant = np.fromiter(("vibrant" in mood for mood in moods), dtype=bool, count=len(moods))
+        warm = warm_color_mask(colors).any(axis=-1)
+        return np.stack([bright, vibrant, warm], axis=1)
+
+    def classify(self, colors: np.ndarray, moods: Sequence[str]) -> List[str]:
+        """여러 이미지의 스타일을 한 번에 결정"""
+        features = self.compute_features(colors, moods)
+        # (n, 규칙 수): 조건이 없거나 기대값과 같은 특징만 있으면 일치
+        matches = ~(self.required & (features[:, None, :] != self.expected)).any(axis=2)
+        # 일치하는 규칙이 없으면 마지막 규칙 사용
+        first_match = np.where(matches.any(axis=1), matches.argmax(axis=1), len(self.names) - 1)
+        return [self.names[index] for index in first_match]
+
+    def determine_lighting(self, mood: str) -> str:
+        """분위기에 따른 조명 종류"""
+        return "bright" if "bright" in mood else "dim"
+
+    def render(self, style: str, colors: List[str], lighting: str) -> dict:
+        """스타일 템플릿에 색상과 조명을 채워 공간 데이터 생성"""
+        template = self.templates.get(style, self.base_template)
+        return template.render({
+            "primary": colors[0] if colors else "#ffffff",
+            "secondary": colors[1] if len(colors) > 1 else "#8B4513",
+            "lighting": lighting,
+            "intensity": LIGHTING_INTENSITY.get(lighting, 1.0),
+        })
+
+    def render_default(self) -> dict:
+        """분석 실패 시 사용하는 기본 공간 데이터"""
+        return self.default_template.render({
+            "primary": "#ffffff",
+            "secondary": "#8B4513",
+            "lighting": "bright",
+            "intensity": 1.0,
+        })
+
+    def build_batch(self, colors: np.ndarray, moods: Sequence[str]) -> List[dict]:
+        """여러 이미지의 스타일, 조명, 공간 데이터를 한 번에 생성 (일괄 가져오기, 테마 재적용용)"""
+        styles = self.classify(colors, moods)
+        results = []
+        for rgb, mood, style in zip(colors, moods, styles):
+            hex_colors = rgb_to_hex(rgb)
+            lighting = self.determine_lighting(mood)
+            results.append({
+                "dominant_colors": hex_colors,
+                "mood": mood,
+                "space_style": style,
+                "lighting": lighting,
+                "space_data": self.render(style, hex_colors, lighting),
+            })
+        return results
@@ -0,0 +1,62 @@
+from rate_limiter import MessageRateLimiter, TokenBucket
+
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucket(rate=2.0, capacity=3.0, now=0.0)
+
+    assert [bucket.consume(0.0) for _ in range(4)] == [True, True, True, False]
+
+    # 0.5초에 토큰 1개 충전
+    assert bucket.consume(0.5)
+    assert not bucket.consume(0.5)
+
+
+def test_token_bucket_refill_is_capped_at_capacity():
+    bucket = TokenBucket(rate=10.0, capacity=2.0, now=0.0)
+    bucket.consume(0.0)
+    bucket.consume(0.0)
+
+    # 오래 기다려도 capacity 이상 쌓이지 않음
+    assert [bucket.consume(100.0) for _ in range(3)] == [True, True, False]
+
+
+def test_type_limit_is_checked_before_connection_limit():
+    limiter = MessageRateLimiter(connection_limit=(0.0, 5.0), type_limits={"move": (0.0, 2.0)})
+
+    assert [limiter.allow(1, "move", now=0.0) for _ in range(4)] == [True, True, False, False]
+    # 거부된 move가 연결 전체 버킷을 소진하지 않아야 chat은 계속 허용됨
+    assert [limiter.allow(1, "chat", now=0.0) for _ in range(4)] == [True, True, True, False]
+
+    stats = limiter.get_stats()
+    assert stats["allowed"] == 5
+    assert stats["throttled"] == 3
+    assert stats["throttled_by_type"] == {"move": 2, "chat": 1}
+    assert stats["throttled_by_user"] == {1: 3}
+
+
+def test_limits_are_per_connection():
+    limiter = MessageRateLimiter(connection_limit=(0.0, 1.0), type_limits={})
+
+    assert limiter.allow(1, "chat", now=0.0)
+    assert not limiter.allow(1, "chat", now=0.0)
+    assert limiter.allow(2, "chat", now=0.0)
+
+
+def test_remove_resets_buckets():
+    limiter = MessageRateLimiter(connection_limit=(0.0, 1.0), type_limits={})
+    limiter.allow(1, "chat", now=0.0)
+    limiter.allow(1, "chat", now=0.0)
+
+    limiter.remove(1)
+
+    assert limiter.allow(1, "chat", now=0.0)
+    assert 1 not in limiter.get_stats()["throttled_by_user"]
+
+
+def test_record_rejected_counts_by_reason():
+    limiter = MessageRateLimiter(connection_limit=(1.0, 1.0), type_limits={})
+    limiter.record_rejected("malformed")
+    limiter.record_rejected("malformed")
+    limiter.record_rejected("unknown_type")
+
+    assert limiter.get_stats()["rejected_by_reason"] == {"malformed": 2, "unknown_type": 1}
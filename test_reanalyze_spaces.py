@@ -0,0 +1,108 @@
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("cv2")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import reanalyze_spaces
+from database import Base
+from models import Space
+from reanalyze_spaces import ReanalysisAborted, SpaceReanalysisJob
+
+
+@pytest.fixture
+def spaces(tmp_path, monkeypatch, request):
+    """이미지 파일이 있는 공간을 가진 임시 SQLite DB (기본 5개)"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(reanalyze_spaces, "SessionLocal", session_factory)
+
+    db = session_factory()
+    count = getattr(request, "param", 5)
+    for index in range(1, count + 1):
+        image_path = tmp_path / f"{index}.jpg"
+        image_path.write_bytes(b"")
+        db.add(Space(id=index, name=f"space {index}", image_url=str(image_path), space_data={}))
+    db.commit()
+    db.close()
+    return session_factory
+
+
+def make_job(tmp_path, **kwargs):
+    return SpaceReanalysisJob(chunk_size=2, workers=0, checkpoint_path=str(tmp_path / "checkpoint.json"), **kwargs)
+
+
+def analysis_for(image_path):
+    return {"space_style": "modern_minimal", "image": image_path}
+
+
+def test_completed_run_clears_checkpoint(tmp_path, spaces, monkeypatch):
+    # 끝까지 처리하면 체크포인트를 지워 다음 실행이 0개를 처리하지 않아야 함
+    monkeypatch.setattr(reanalyze_spaces, "reanalyze_image", analysis_for)
+
+    result = make_job(tmp_path).run()
+    assert result["completed"]
+    assert result["updated"] == 5
+    assert not (tmp_path / "checkpoint.json").exists()
+
+    assert make_job(tmp_path).run()["updated"] == 5
+
+
+def test_failed_rows_are_retried(tmp_path, spaces, monkeypatch):
+    # 처음 실패한 행은 본 처리 이후 다시 시도
+    attempts = {}
+
+    def flaky(image_path):
+        attempts[image_path] = attempts.get(image_path, 0) + 1
+        if image_path.endswith("3.jpg") and attempts[image_path] == 1:
+            return None
+        return analysis_for(image_path)
+
+    monkeypatch.setattr(reanalyze_spaces, "reanalyze_image", flaky)
+
+    result = make_job(tmp_path).run()
+    assert result["completed"]
+    assert result["failed_ids"] == []
+    assert result["updated"] == 5
+
+    db = spaces()
+    assert db.get(Space, 3).space_data["image"].endswith("3.jpg")
+    db.close()
+
+
+def test_failures_before_any_success_abort_without_advancing(tmp_path, spaces, monkeypatch):
+    # 환경 문제로 모든 분석이 실패하면 체크포인트를 진행시키지 않고 중단
+    monkeypatch.setattr(reanalyze_spaces, "reanalyze_image", lambda image_path: None)
+
+    job = make_job(tmp_path, max_initial_failures=3)
+    with pytest.raises(ReanalysisAborted):
+        job.run()
+
+    checkpoint = make_job(tmp_path).load_checkpoint()
+    assert checkpoint["last_id"] == 2
+    assert checkpoint["failed_ids"] == [1, 2]
+
+    # 환경이 복구되면 체크포인트부터 재개하고 실패했던 행도 다시 처리
+    monkeypatch.setattr(reanalyze_spaces, "reanalyze_image", analysis_for)
+    result = make_job(tmp_path).run()
+    assert result["completed"]
+    assert result["failed_ids"] == []
+    assert result["updated"] == 5
+
+
+@pytest.mark.parametrize("spaces", [60], indirect=True)
+def test_scattered_bad_images_do_not_abort(tmp_path, spaces, monkeypatch):
+    # 성공한 분석이 있으면 손상된 이미지가 많아도 중단하지 않고, 재시도 단계에서도 중단하지 않음
+    def every_third_fails(image_path):
+        index = int(image_path.rsplit("/", 1)[-1].split(".")[0])
+        return None if index % 3 == 0 else analysis_for(image_path)
+
+    monkeypatch.setattr(reanalyze_spaces, "reanalyze_image", every_third_fails)
+
+    result = make_job(tmp_path, max_initial_failures=3).run()
+    assert result["completed"]
+    assert result["updated"] == 40
+    assert result["failed_ids"] == list(range(3, 61, 3))
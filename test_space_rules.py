@@ -0,0 +1,217 @@
+import json
+from typing import List
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from space_rules import SpaceRuleEngine, hex_to_rgb, rgb_to_hex
+
+MOODS = ["bright_vibrant", "bright_calm", "dark_vibrant", "dark_calm"]
+
+
+class LegacyImageService:
+    """규칙 테이블 도입 전 ImageService의 스타일/공간 데이터 생성 로직 (비교 기준)"""
+
+    def determine_space_style(self, colors: List[str], mood: str) -> str:
+        if "bright" in mood:
+            if any(self.is_warm_color(color) for color in colors):
+                return "modern_warm"
+            else:
+                return "modern_minimal"
+        else:
+            if any(self.is_warm_color(color) for color in colors):
+                return "cozy_rustic"
+            else:
+                return "industrial"
+
+    def is_warm_color(self, hex_color: str) -> bool:
+        r = int(hex_color[1:3], 16)
+        g = int(hex_color[3:5], 16)
+        b = int(hex_color[5:7], 16)
+        return r > g and r > b
+
+    def determine_lighting(self, mood: str) -> str:
+        if "bright" in mood:
+            return "bright"
+        else:
+            return "dim"
+
+    def generate_space_data(self, style: str, colors: List[str], lighting: str) -> dict:
+        base_space = {
+            "walls": {"material": "concrete", "color": colors[0] if colors else "#ffffff"},
+            "floor": {"material": "wood", "color": colors[1] if len(colors) > 1 else "#8B4513"},
+            "ceiling": {"material": "concrete", "color": "#ffffff"},
+            "lighting": {"type": lighting, "intensity": 1.0 if lighting == "bright" else 0.3},
+            "furniture": []
+        }
+        if "modern" in style:
+            base_space["furniture"] = [
+                {"type": "sofa", "position": [0, 0, -2], "color": colors[0]},
+                {"type": "coffee_table", "position": [0, 0, -1], "color": "#8B4513"},
+                {"type": "lamp", "position": [2, 1, -2], "color": "#FFD700"}
+            ]
+        elif "cozy" in style:
+            base_space["furniture"] = [
+                {"type": "armchair", "position": [0, 0, -2], "color": "#8B4513"},
+                {"type": "fireplace", "position": [0, 0, -3], "color": "#696969"},
+                {"type": "bookshelf", "position": [3, 0, 0], "color": "#8B4513"}
+            ]
+        return base_space
+
+    def generate_default_space_data(self) -> dict:
+        return {
+            "walls": {"material": "concrete", "color": "#ffffff"},
+            "floor": {"material": "wood", "color": "#8B4513"},
+            "ceiling": {"material": "concrete", "color": "#ffffff"},
+            "lighting": {"type": "bright", "intensity": 1.0},
+            "furniture": [
+                {"type": "sofa", "position": [0, 0, -2], "color": "#87CEEB"},
+                {"type": "coffee_table", "position": [0, 0, -1], "color": "#8B4513"}
+            ]
+        }
+
+
+def as_json(document):
+    # 저장/응답 시와 같이 JSON으로 직렬화한 결과로 비교 (튜플은 리스트로 출력됨)
+    return json.loads(json.dumps(document))
+
+
+@pytest.fixture
+def random_inputs():
+    rng = np.random.default_rng(0)
+    colors = rng.integers(0, 256, (500, 3, 3))
+    moods = rng.choice(MOODS, 500).tolist()
+    return colors, moods
+
+
+def test_classify_matches_legacy_rules(random_inputs):
+    colors, moods = random_inputs
+    legacy = LegacyImageService()
+
+    styles = SpaceRuleEngine().classify(colors, moods)
+
+    expected = [legacy.determine_space_style(rgb_to_hex(rgb), mood) for rgb, mood in zip(colors, moods)]
+    assert styles == expected
+    assert set(styles) == {"modern_warm", "modern_minimal", "cozy_rustic", "industrial"}
+
+
+def test_render_matches_legacy_space_data(random_inputs):
+    colors, moods = random_inputs
+    legacy = LegacyImageService()
+    engine = SpaceRuleEngine()
+
+    for rgb, mood, style in zip(colors, moods, engine.classify(colors, moods)):
+        hex_colors = rgb_to_hex(rgb)
+        lighting = engine.determine_lighting(mood)
+        assert lighting == legacy.determine_lighting(mood)
+        assert as_json(engine.render(style, hex_colors, lighting)) == legacy.generate_space_data(style, hex_colors, lighting)
+
+
+def test_unknown_style_renders_base_space_without_furniture():
+    # 기존 로직과 같이 알 수 없는 스타일은 가구 없이 기본 문서만 생성
+    legacy = LegacyImageService()
+    colors = ["#123456", "#654321"]
+    space = SpaceRuleEngine().render("unknown", colors, "dim")
+    assert space["furniture"] == []
+    assert as_json(space) == legacy.generate_space_data("unknown", colors, "dim")
+
+
+def test_hex_to_rgb_round_trips(random_inputs):
+    colors, _ = random_inputs
+    for rgb in colors[:20]:
+        assert hex_to_rgb(rgb_to_hex(rgb)).tolist() == rgb.tolist()
+    assert hex_to_rgb([]).shape == (0, 3)
+
+
+def test_image_service_accepts_hex_colors(random_inputs):
+    pytest.importorskip("cv2")
+    pytest.importorskip("passlib")
+    from services import ImageService
+
+    colors, moods = random_inputs
+    legacy = LegacyImageService()
+    service = ImageService()
+
+    assert service.determine_space_style(["#ff0000", "#000000"], "bright") == "modern_warm"
+    assert service.determine_space_style([], "dark_calm") == "industrial"
+    assert service.is_warm_color("#ff0000") and not service.is_warm_color("#0000ff")
+    for rgb, mood in zip(colors[:50], moods[:50]):
+        hex_colors = rgb_to_hex(rgb)
+        expected = legacy.determine_space_style(hex_colors, mood)
+        assert service.determine_space_style(hex_colors, mood) == expected
+        assert service.determine_space_style(rgb, mood) == expected
+
+
+def test_render_default_matches_legacy():
+    assert as_json(SpaceRuleEngine().render_default()) == LegacyImageService().generate_default_space_data()
+
+
+def test_build_batch_returns_analysis_documents(random_inputs):
+    colors, moods = random_inputs
+    engine = SpaceRuleEngine()
+
+    results = engine.build_batch(colors[:10], moods[:10])
+
+    assert [result["space_style"] for result in results] == engine.classify(colors[:10], moods[:10])
+    assert results[0]["dominant_colors"] == rgb_to_hex(colors[0])
+    assert results[0]["space_data"]["walls"]["color"] == rgb_to_hex(colors[0])[0]
+
+
+def test_mutating_rendered_data_does_not_change_templates():
+    engine = SpaceRuleEngine()
+    colors = ["#aa0000", "#00aa00"]
+
+    first = engine.render("modern_warm", colors, "bright")
+    first["walls"]["material"] = "glass"
+    first["furniture"][0]["color"] = "#000000"
+    first["furniture"].append({"type": "plant"})
+    with pytest.raises(TypeError):
+        first["furniture"][0]["position"][0] = 99
+
+    second = engine.render("modern_warm", colors, "bright")
+    assert second["walls"]["material"] == "concrete"
+    assert second["furniture"][0] == {"type": "sofa", "position": (0, 0, -2), "color": "#aa0000"}
+    assert len(second["furniture"]) == 3
+
+
+def test_configured_style_takes_priority(tmp_path):
+    path = tmp_path / "styles.json"
+    path.write_text(json.dumps([{
+        "name": "beach_house",
+        "when": {"bright": True, "vibrant": True},
+        "template": {"floor": {"material": "sand", "color": "$secondary"}},
+    }]))
+    engine = SpaceRuleEngine()
+    engine.load_styles_file(str(path))
+
+    colors = np.array([[[200, 10, 10], [0, 0, 0], [0, 0, 0]]] * 2)
+    assert engine.classify(colors, ["bright_vibrant", "bright_calm"]) == ["beach_house", "modern_warm"]
+
+    space = engine.render("beach_house", ["#ffffff", "#eeddcc"], "bright")
+    assert space["floor"] == {"material": "sand", "color": "#eeddcc"}
+    assert space["walls"] == {"material": "concrete", "color": "#ffffff"}
+
+
+@pytest.mark.parametrize("template", [
+    {"walls": {"material": "concrete", "color": "$accent"}},
+    {"walls": "red"},
+    {"furniture": {"type": "sofa"}},
+    {"furniture": [{"type": "sofa", "position": ["$primary", 0, 0]}]},
+    {"walls": {"material": {"kind": "brick"}}},
+])
+def test_invalid_templates_are_rejected_when_loaded(tmp_path, template):
+    path = tmp_path / "styles.json"
+    path.write_text(json.dumps([{"name": "broken", "when": {}, "template": template}]))
+    engine = SpaceRuleEngine()
+
+    with pytest.raises(ValueError):
+        engine.load_styles_file(str(path))
+    # 실패한 스타일은 규칙 테이블에 남지 않음
+    assert "broken" not in engine.names
+    assert len(engine.names) == len(engine.required) == 4
+
+
+def test_unknown_condition_is_rejected():
+    with pytest.raises(ValueError):
+        SpaceRuleEngine().add_style({"name": "x", "when": {"sunny": True}})
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import random
+import time
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from websocket_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    """전송마다 이벤트 루프에 제어를 넘기는 테스트용 WebSocket"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed_code = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await asyncio.sleep(random.random() / 1000)
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        raise AssertionError("압축되지 않은 연결에 바이너리 프레임 전송")
+
+    async def close(self, code=1000):
+        self.closed_code = code
+
+
+def membership_events(websocket, space_id):
+    return [
+        message for message in websocket.sent
+        if message.get("space_id") == space_id and message["type"] in ("space_info", "user_joined", "user_left")
+    ]
+
+
+def test_membership_diffs_arrive_in_seq_order():
+    async def scenario():
+        random.seed(0)
+        manager = ConnectionManager()
+        sockets = {user_id: FakeWebSocket() for user_id in range(1, 21)}
+        for user_id, websocket in sockets.items():
+            await manager.connect(websocket, user_id)
+
+        # 입장/퇴장/연결 해제가 섞여 동시에 일어나는 상황
+        async def churn(user_id):
+            await manager.join_space(user_id, 7)
+            await asyncio.sleep(random.random() / 1000)
+            if user_id % 3 == 0:
+                await manager.leave_space(user_id)
+            elif user_id % 5 == 0:
+                manager.disconnect(sockets[user_id], user_id)
+
+        await asyncio.gather(*(churn(user_id) for user_id in sockets))
+        await asyncio.sleep(0.05)
+        return manager, sockets
+
+    manager, sockets = asyncio.run(scenario())
+
+    for user_id, websocket in sockets.items():
+        events = membership_events(websocket, 7)
+        if not events:
+            # 대기 중인 메시지를 받기 전에 연결을 끊은 사용자
+            continue
+        assert events[0]["type"] == "space_info"
+        # 명단 이후 변경분은 빠짐없이 1씩 증가해야 함 (재동기화 불필요)
+        seqs = [event["seq"] for event in events]
+        assert seqs == list(range(seqs[0], seqs[0] + len(seqs))), (user_id, seqs)
+
+    # 마지막까지 남은 사용자가 명단과 변경분으로 재구성한 멤버 목록이 실제와 같아야 함
+    remaining = set(manager.get_users_in_space(7))
+    for user_id in remaining:
+        members = set()
+        for event in membership_events(sockets[user_id], 7):
+            if event["type"] == "space_info":
+                members = set(event["users_in_space"])
+            elif event["type"] == "user_joined":
+                members.add(event["user_id"])
+            else:
+                members.discard(event["user_id"])
+        assert members == remaining
+
+
+def test_send_failure_removes_user_from_all_indexes():
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, text):
+            raise RuntimeError("connection reset")
+
+    async def scenario():
+        manager = ConnectionManager()
+        healthy, broken = FakeWebSocket(), BrokenWebSocket()
+        await manager.connect(healthy, 1)
+        await manager.join_space(1, 7)
+        await manager.connect(broken, 2)
+        await asyncio.sleep(0.01)
+        return manager, healthy
+
+    manager, healthy = asyncio.run(scenario())
+
+    assert 2 not in manager.active_connections
+    assert 2 not in manager.channels
+    assert manager.get_user_space(2) is None
+    assert manager.get_users_in_space(7) == [1]
+    assert manager.get_heartbeat_stats()["reaped_send_error"] == 1
+
+
+def test_dropped_socket_is_closed_and_cannot_rejoin():
+    class BrokenWebSocket(FakeWebSocket):
+        async def send_text(self, text):
+            raise RuntimeError("connection reset")
+
+    async def scenario():
+        manager = ConnectionManager()
+        broken = BrokenWebSocket()
+        await manager.connect(broken, 2)
+        await asyncio.sleep(0.01)
+        # 정리된 소켓의 수신 루프에서 늦게 도착한 입장 요청
+        await manager.join_space(2, 5)
+        manager.disconnect(broken, 2)
+        return manager, broken
+
+    manager, broken = asyncio.run(scenario())
+
+    assert broken.closed_code == 1011
+    assert manager.space_users == {}
+    assert manager.get_user_space(2) is None
+
+
+def test_reconnect_closes_superseded_socket():
+    async def scenario():
+        manager = ConnectionManager()
+        old, new = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(old, 1)
+        await manager.join_space(1, 7)
+        await manager.connect(new, 1)
+        # 이전 소켓의 수신 루프가 종료되며 호출하는 disconnect는 새 연결에 영향 없음
+        manager.disconnect(old, 1)
+        await asyncio.sleep(0.01)
+        return manager, old, new
+
+    manager, old, new = asyncio.run(scenario())
+
+    assert old.closed_code == 4000
+    assert new.closed_code is None
+    assert manager.active_connections[1] is new
+    assert manager.get_user_space(1) == 7
+    assert {"type": "connection_established", "user_id": 1} in new.sent
+
+
+def test_queue_overflow_during_fanout_drops_user_after_broadcast():
+    class StalledWebSocket(FakeWebSocket):
+        async def send_text(self, text):
+            await asyncio.Event().wait()
+
+    async def scenario():
+        manager = ConnectionManager(batch_window=0)
+        sockets = {1: FakeWebSocket(), 2: StalledWebSocket(), 3: FakeWebSocket()}
+        for user_id, websocket in sockets.items():
+            await manager.connect(websocket, user_id)
+            await manager.join_space(user_id, 7)
+        manager.channels[2].max_pending = 3
+
+        # 팬아웃 도중 2번 사용자의 큐가 넘쳐도 순회 중인 멤버 집합은 변경되지 않아야 함
+        for index in range(5):
+            await manager.broadcast_to_space(7, {"type": "chat", "user_id": 1, "message": str(index)})
+        await asyncio.sleep(0.01)
+        return manager, sockets
+
+    manager, sockets = asyncio.run(scenario())
+
+    assert sorted(manager.get_users_in_space(7)) == [1, 3]
+    assert 2 not in manager.active_connections
+    assert manager.get_heartbeat_stats()["reaped_send_error"] == 1
+    chats = [message for message in sockets[3].sent if message["type"] == "chat"]
+    assert len(chats) == 5
+    assert {"type": "user_left", "user_id": 2, "space_id": 7, "seq": 4} in sockets[3].sent
+
+
+def test_heartbeat_pings_idle_connections_then_evicts_them():
+    async def scenario():
+        manager = ConnectionManager(heartbeat_interval=15, idle_timeout=45)
+        idle, active = FakeWebSocket(), FakeWebSocket()
+        await manager.connect(idle, 1)
+        await manager.connect(active, 2)
+        await manager.join_space(1, 7)
+        await manager.join_space(2, 7)
+        start = time.monotonic()
+
+        # 간격이 지나면 ping을 한 번만 보냄
+        manager.last_seen[2] = start + 20
+        assert await manager.sweep_idle_connections(start + 20) == 0
+        assert await manager.sweep_idle_connections(start + 25) == 0
+        await asyncio.sleep(0.01)
+        awaiting = manager.get_heartbeat_stats()["awaiting_pong"]
+
+        # 제한 시간이 지나도록 응답이 없으면 정리
+        manager.touch(2)
+        manager.last_seen[2] = start + 50
+        evicted = await manager.sweep_idle_connections(start + 50)
+        await asyncio.sleep(0.01)
+        return manager, idle, active, awaiting, evicted
+
+    manager, idle, active, awaiting, evicted = asyncio.run(scenario())
+
+    assert [message for message in idle.sent if message["type"] == "ping"] == [{"type": "ping"}]
+    assert not any(message["type"] == "ping" for message in active.sent)
+    assert awaiting == 1
+    assert evicted == 1
+    assert idle.closed_code == 1001
+    assert active.closed_code is None
+    assert manager.get_users_in_space(7) == [2]
+    stats = manager.get_heartbeat_stats()
+    assert stats["reaped_idle"] == 1
+    assert stats["reaped_send_error"] == 0
+    assert stats["tracked"] == 1
+    assert stats["awaiting_pong"] == 0
+    assert {"type": "user_left", "user_id": 1, "space_id": 7, "seq": 3} in active.sent
+
+
+def test_sweep_does_not_evict_user_who_reconnects_during_close():
+    class SlowCloseWebSocket(FakeWebSocket):
+        async def close(self, code=1000):
+            await asyncio.sleep(0.01)
+            self.closed_code = code
+
+    async def scenario():
+        manager = ConnectionManager(heartbeat_interval=15, idle_timeout=45)
+        first, second = SlowCloseWebSocket(), SlowCloseWebSocket()
+        await manager.connect(first, 1)
+        await manager.connect(second, 2)
+        fresh = FakeWebSocket()
+
+        async def reconnect():
+            # 첫 번째 소켓을 닫는 동안 2번 사용자가 재접속
+            await asyncio.sleep(0.005)
+            await manager.connect(fresh, 2)
+
+        sweep = manager.sweep_idle_connections(time.monotonic() + 60)
+        evicted, _ = await asyncio.gather(sweep, reconnect())
+        await asyncio.sleep(0.01)
+        return manager, second, fresh, evicted
+
+    manager, second, fresh, evicted = asyncio.run(scenario())
+
+    assert evicted == 2
+    assert second.closed_code == 1001
+    assert fresh.closed_code is None
+    assert manager.active_connections == {2: fresh}
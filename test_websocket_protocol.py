@@ -0,0 +1,141 @@
+import asyncio
+import json
+import zlib
+
+from websocket_protocol import (
+    OutboundChannel,
+    ProtocolStats,
+    deflate_negotiated,
+    prevalidate_frame,
+    validate_message,
+)
+
+
+def test_prevalidate_extracts_type():
+    assert prevalidate_frame('{"type": "move", "space_id": 1, "position": [0, 0, 0]}', 4096) == ("move", None)
+
+
+def test_prevalidate_rejects_oversized_frame():
+    assert prevalidate_frame('{"type": "chat"}' + " " * 100, 50) == (None, "message_too_large")
+
+
+def test_prevalidate_rejects_non_object():
+    assert prevalidate_frame('["type", "chat"]', 4096) == (None, "malformed")
+    assert prevalidate_frame("not json", 4096) == (None, "malformed")
+
+
+def test_prevalidate_rejects_missing_and_unknown_type():
+    assert prevalidate_frame('{"space_id": 1}', 4096) == (None, "missing_type")
+    assert prevalidate_frame('{"type": "teleport"}', 4096) == (None, "unknown_type")
+
+
+def test_prevalidate_ignores_escaped_type_inside_strings():
+    data = json.dumps({"message": '"type":"move"'})
+    assert prevalidate_frame(data, 4096) == (None, "missing_type")
+
+
+def test_validate_accepts_well_formed_messages():
+    assert validate_message({"type": "join_space", "space_id": 3}, "join_space") is None
+    assert validate_message({"type": "chat", "space_id": 3, "message": "hi"}, "chat") is None
+    assert validate_message({"type": "move", "space_id": 3, "position": {"x": 1}}, "move") is None
+    assert validate_message({"type": "pong"}, "pong") is None
+
+
+def test_prevalidate_ignores_nested_type():
+    # 중첩 객체의 "type"은 무시하고 최상위 타입으로 분류 (속도 제한 버킷도 최상위 타입 기준)
+    data = '{"position": {"type": "chat"}, "type": "move", "space_id": 1}'
+    assert prevalidate_frame(data, 4096) == ("move", None)
+    data = '{"position": [{"type": "x"}], "message": "{[", "type": "chat"}'
+    assert prevalidate_frame(data, 4096) == ("chat", None)
+    assert prevalidate_frame('{"position": {"type": "move"}}', 4096) == (None, "missing_type")
+
+
+def test_validate_rejects_type_mismatch():
+    # 중복 키는 json.loads가 마지막 값을 사용하므로 사전 검사 결과와 다르면 거부
+    data = '{"type": "move", "type": "chat", "space_id": 1, "message": "x"}'
+    message_type, error = prevalidate_frame(data, 4096)
+    assert (message_type, error) == ("move", None)
+    assert validate_message(json.loads(data), message_type) == "type_mismatch"
+
+
+def test_validate_rejects_missing_or_wrong_fields():
+    assert validate_message({"type": "chat", "space_id": 1}, "chat") == "invalid_message"
+    assert validate_message({"type": "chat", "space_id": "1", "message": "x"}, "chat") == "invalid_space_id"
+    assert validate_message({"type": "join_space", "space_id": True}, "join_space") == "invalid_space_id"
+    assert validate_message({"type": "move", "space_id": 1, "position": 5}, "move") == "invalid_position"
+
+
+def test_validate_rejects_non_object():
+    assert validate_message(None, "chat") == "malformed"
+    assert validate_message([1, 2], "chat") == "malformed"
+
+
+class RecordingWebSocket:
+    """전송된 프레임을 (종류, 내용)으로 기록하는 테스트용 WebSocket"""
+
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, text):
+        self.frames.append(("text", text))
+
+    async def send_bytes(self, data):
+        self.frames.append(("bytes", data))
+
+
+def run_channel(payloads, **kwargs):
+    async def scenario():
+        websocket, stats = RecordingWebSocket(), ProtocolStats()
+        channel = OutboundChannel(websocket, stats, **kwargs)
+        for payload in payloads:
+            channel.enqueue(payload)
+        await asyncio.sleep(0.02)
+        return websocket, stats
+
+    return asyncio.run(scenario())
+
+
+def test_channel_sends_one_frame_per_message_without_batching():
+    websocket, stats = run_channel(['{"n": 1}', '{"n": 2}'])
+    assert websocket.frames == [("text", '{"n": 1}'), ("text", '{"n": 2}')]
+    assert stats.get_stats()["frames_saved"] == 0
+
+
+def test_channel_batches_messages_within_window_into_array_frame():
+    websocket, stats = run_channel(['{"n": 1}', '{"n": 2}', '{"n": 3}'], batch_window=0.005)
+    assert len(websocket.frames) == 1
+    kind, text = websocket.frames[0]
+    assert kind == "text"
+    assert json.loads(text) == [{"n": 1}, {"n": 2}, {"n": 3}]
+
+    result = stats.get_stats()
+    assert result["events_sent"] == 3
+    assert result["frames_sent"] == 1
+    assert result["batched_frames"] == 1
+    assert result["frames_saved"] == 2
+
+
+def test_channel_compresses_frames_at_threshold_only():
+    large = json.dumps({"message": "a" * 200})
+    small = '{"n": 1}'
+    websocket, stats = run_channel([large, small], compress_threshold=len(large))
+
+    (large_kind, data), (small_kind, text) = websocket.frames
+    # 임계값 이상은 raw deflate 바이너리 프레임, 미만은 그대로 텍스트 프레임
+    assert large_kind == "bytes"
+    assert zlib.decompress(data, -zlib.MAX_WBITS).decode("utf-8") == large
+    assert (small_kind, text) == ("text", small)
+
+    result = stats.get_stats()
+    assert result["compressed_frames"] == 1
+    assert result["bytes_raw"] == len(large) + len(small)
+    assert result["bytes_sent"] == len(data) + len(small)
+    assert result["bytes_saved"] == len(large) - len(data) > 0
+
+
+def test_deflate_negotiated_requires_setting_and_client_offer():
+    offer = "permessage-deflate; client_max_window_bits"
+    assert deflate_negotiated(offer, True)
+    assert deflate_negotiated("x-custom, permessage-deflate", True)
+    assert not deflate_negotiated(offer, False)
+    assert not deflate_negotiated("", True)
@@ -1,24 +1,85 @@
 from fastapi import WebSocket
-from typing import Dict, List, Set
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Set, Tuple
 import json
 import asyncio
+import time
+
+from websocket_protocol import OutboundChannel, ProtocolStats, error_message
 
 class ConnectionManager:
-    def __init__(self):
+    def __init__(
+        self,
+        batch_window: float = 0.005,
+        compress_threshold: Optional[int] = 1024,
+        heartbeat_interval: float = 15.0,
+        idle_timeout: float = 45.0,
+    ):
         # 사용자별 WebSocket 연결
         self.active_connections: Dict[int, WebSocket] = {}
         
-        # 공간별 접속한 사용자들
+        # 사용자별 송신 채널 (배칭/압축 처리)
+        self.channels: Dict[int, OutboundChannel] = {}
+        self.batch_window = batch_window
+        # None이면 ?compress 요청을 무시
+        self.compress_threshold = compress_threshold
+        self.protocol_stats = ProtocolStats()
+        
+        # 공간별 접속한 사용자들 (입장/퇴장 시 복사 없이 제자리에서 변경)
         self.space_users: Dict[int, Set[int]] = {}
         
+        # 공간별 멤버십 시퀀스 번호 (입장/퇴장마다 1씩 증가)
+        self.space_seq: Dict[int, int] = {}
+        
         # 사용자가 접속한 공간
         self.user_spaces: Dict[int, int] = {}
+        
+        # 하트비트: 마지막 수신 시각 순으로 정렬 (가장 오래된 연결이 앞)
+        # 한 개의 스케줄러 태스크가 앞쪽의 유휴 연결만 검사
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.last_seen: "OrderedDict[int, float]" = OrderedDict()
+        self.pinged: Set[int] = set()
+        self.heartbeat_task: Optional[asyncio.Task] = None
+        
+        # 정리된 연결 수
+        self.reaped_idle = 0
+        self.reaped_send_error = 0
+        
+        # 연결 정리 시 호출할 콜백 (예: 속도 제한 버킷 정리)
+        self.disconnect_listeners: List[Callable[[int], None]] = []
+        
+        # 공간 팬아웃 중 큐가 넘친 연결은 순회가 끝난 뒤 정리 (순회 중인 멤버 집합을 변경하지 않도록)
+        self.fanout_active = False
+        self.deferred_drops: List[Tuple[int, WebSocket, Exception]] = []
+        
+        # 동기 코드에서 시작한 소켓 종료 태스크 (완료 전에 가비지 컬렉션되지 않도록 보관)
+        self.close_tasks: Set[asyncio.Task] = set()
     
-    async def connect(self, websocket: WebSocket, user_id: int):
-        """사용자 연결"""
+    async def connect(self, websocket: WebSocket, user_id: int, batch: bool = False, compress: bool = False):
+        """사용자 연결 (batch, compress는 클라이언트가 선택)"""
         await websocket.accept()
+        old_websocket = self.active_connections.get(user_id)
         self.active_connections[user_id] = websocket
         
+        # 같은 사용자가 재접속한 경우 이전 채널의 대기 메시지 정리
+        old_channel = self.channels.get(user_id)
+        if old_channel is not None:
+            old_channel.close()
+        self.channels[user_id] = OutboundChannel(
+            websocket,
+            self.protocol_stats,
+            batch_window=self.batch_window if batch else 0.0,
+            compress_threshold=self.compress_threshold if compress else None,
+            on_error=lambda e: self._drop_connection(user_id, websocket, e),
+        )
+        self.touch(user_id)
+        
+        # 교체된 이전 소켓을 닫아 그 수신 루프가 새 연결을 살아있는 것으로 갱신하지 않도록 함
+        # (active_connections를 먼저 바꿨으므로 이전 루프의 disconnect는 새 연결을 정리하지 않음)
+        if old_websocket is not None and old_websocket is not websocket:
+            await self._close_websocket(old_websocket, 4000)
+        
         # 연결 확인 메시지 전송
         await self.send_personal_message(
             {"type": "connection_established", "user_id": user_id}, 
@@ -27,100 +88,247 @@ class ConnectionManager:
     
     def disconnect(self, websocket: WebSocket, user_id: int):
         """사용자 연결 해제"""
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+        # 재접속으로 교체되었거나 이미 정리된 연결이면 무시
+        if self.active_connections.get(user_id) is not websocket:
+            return
         
-        # 사용자가 접속한 공간에서 제거
-        if user_id in self.user_spaces:
-            space_id = self.user_spaces[user_id]
-            if space_id in self.space_users:
-                self.space_users[space_id].discard(user_id)
-            del self.user_spaces[user_id]
+        self._release(user_id)
     
-    async def send_personal_message(self, message: dict, user_id: int):
-        """특정 사용자에게 메시지 전송"""
+    def _release(self, user_id: int):
+        """사용자를 모든 인덱스에서 제거하고 남은 사용자들에게 퇴장 알림"""
+        self.active_connections.pop(user_id, None)
+        
+        channel = self.channels.pop(user_id, None)
+        if channel is not None:
+            channel.close()
+        
+        self.last_seen.pop(user_id, None)
+        self.pinged.discard(user_id)
+        
+        for listener in self.disconnect_listeners:
+            listener(user_id)
+        
+        # 시퀀스 번호를 정한 직후 같은 동기 구간에서 큐에 넣어야 수신 순서가 시퀀스 순서와 같음
+        removed = self._remove_member(user_id)
+        if removed is not None:
+            self._enqueue_left(user_id, *removed)
+    
+    async def _close_websocket(self, websocket: WebSocket, code: int):
+        """소켓 종료 (이미 닫힌 소켓의 오류는 무시)"""
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+    
+    def add_disconnect_listener(self, listener: Callable[[int], None]):
+        """연결 정리 시 호출할 콜백 등록"""
+        self.disconnect_listeners.append(listener)
+    
+    def touch(self, user_id: int):
+        """사용자로부터 메시지를 받았음을 기록"""
         if user_id in self.active_connections:
+            self.last_seen[user_id] = time.monotonic()
+            self.last_seen.move_to_end(user_id)
+            self.pinged.discard(user_id)
+    
+    def start_heartbeat(self):
+        """하트비트 스케줄러 시작 (모든 연결에 대해 태스크 하나만 사용)"""
+        if self.heartbeat_task is None:
+            self.heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+    
+    def stop_heartbeat(self):
+        """하트비트 스케줄러 중지"""
+        if self.heartbeat_task is not None:
+            self.heartbeat_task.cancel()
+            self.heartbeat_task = None
+    
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
             try:
-                await self.active_connections[user_id].send_text(json.dumps(message))
+                await self.sweep_idle_connections()
             except Exception as e:
-                print(f"Error sending message to user {user_id}: {e}")
-                # 연결이 끊어진 경우 정리
-                if user_id in self.active_connections:
-                    del self.active_connections[user_id]
+                print(f"Error during heartbeat sweep: {e}")
+    
+    async def sweep_idle_connections(self, now: Optional[float] = None) -> int:
+        """유휴 연결에 ping을 보내고 응답 없는 연결을 정리 (정리한 연결 수 반환)"""
+        if now is None:
+            now = time.monotonic()
+        
+        to_ping = []
+        to_evict = []
+        # 오래된 순으로 정렬되어 있으므로 최근 활동한 연결을 만나면 중단
+        for user_id, seen in self.last_seen.items():
+            idle = now - seen
+            if idle < self.heartbeat_interval:
+                break
+            if idle >= self.idle_timeout:
+                to_evict.append(user_id)
+            elif user_id not in self.pinged:
+                to_ping.append(user_id)
+        
+        # 정리와 ping은 await 없이 처리하고 소켓 종료는 마지막에 수행
+        # (종료를 기다리는 동안 재접속한 사용자의 새 연결을 정리하지 않도록)
+        evicted = []
+        for user_id in to_evict:
+            websocket = self.active_connections.get(user_id)
+            self._release(user_id)
+            self.reaped_idle += 1
+            if websocket is not None:
+                evicted.append(websocket)
+        
+        if to_ping:
+            payload = json.dumps({"type": "ping"})
+            for user_id in to_ping:
+                self.pinged.add(user_id)
+                self._enqueue(payload, user_id)
+        
+        for websocket in evicted:
+            await self._close_websocket(websocket, 1001)
+        
+        return len(to_evict)
+    
+    async def send_personal_message(self, message: dict, user_id: int):
+        """특정 사용자에게 메시지 전송"""
+        self._enqueue(json.dumps(message), user_id)
+    
+    def _enqueue(self, payload: str, user_id: int):
+        """사용자의 송신 큐에 메시지 추가 (전송 실패 시 채널의 on_error로 정리됨)"""
+        channel = self.channels.get(user_id)
+        if channel is not None:
+            channel.enqueue(payload)
+    
+    def _drop_connection(self, user_id: int, websocket: WebSocket, error: Exception):
+        """전송 실패한 연결을 모든 인덱스에서 정리"""
+        if self.fanout_active:
+            self.deferred_drops.append((user_id, websocket, error))
+            return
+        
+        print(f"Error sending message to user {user_id}: {error}")
+        # 같은 사용자가 재접속한 경우 새 연결은 유지
+        if self.active_connections.get(user_id) is websocket:
+            self._release(user_id)
+            self.reaped_send_error += 1
+            # 소켓을 닫아 수신 루프도 종료되도록 함 (정리된 연결로 다시 입장하는 것을 방지)
+            task = asyncio.get_running_loop().create_task(self._close_websocket(websocket, 1011))
+            self.close_tasks.add(task)
+            task.add_done_callback(self.close_tasks.discard)
     
-    async def broadcast_to_space(self, space_id: int, message: dict):
+    async def broadcast_to_space(self, space_id: int, message: dict, exclude_user: Optional[int] = None):
         """특정 공간의 모든 사용자에게 메시지 브로드캐스트"""
-        if space_id in self.space_users:
-            disconnected_users = []
-            
-            for user_id in self.space_users[space_id]:
-                try:
-                    await self.send_personal_message(message, user_id)
-                except Exception as e:
-                    print(f"Error broadcasting to user {user_id}: {e}")
-                    disconnected_users.append(user_id)
-            
-            # 연결이 끊어진 사용자들 정리
-            for user_id in disconnected_users:
-                self.space_users[space_id].discard(user_id)
-                if user_id in self.user_spaces:
-                    del self.user_spaces[user_id]
+        self._enqueue_to_space(space_id, json.dumps(message), exclude_user)
+    
+    def _enqueue_to_space(self, space_id: int, payload: str, exclude_user: Optional[int] = None):
+        """공간의 모든 사용자 송신 큐에 메시지 추가 (await 없이 한 번에 처리)"""
+        members = self.space_users.get(space_id)
+        if not members:
+            return
+        
+        self.fanout_active = True
+        try:
+            for user_id in members:
+                if user_id != exclude_user:
+                    self._enqueue(payload, user_id)
+        finally:
+            self.fanout_active = False
+        
+        # 순회가 끝난 뒤 큐가 넘친 연결 정리 (정리하며 보내는 퇴장 알림도 같은 방식으로 처리)
+        while self.deferred_drops:
+            user_id, websocket, error = self.deferred_drops.pop()
+            self._drop_connection(user_id, websocket, error)
+    
+    def _add_member(self, user_id: int, space_id: int) -> int:
+        """공간 멤버 추가 후 새 시퀀스 번호 반환"""
+        self.space_users.setdefault(space_id, set()).add(user_id)
+        self.user_spaces[user_id] = space_id
+        seq = self.space_seq.get(space_id, 0) + 1
+        self.space_seq[space_id] = seq
+        return seq
+    
+    def _remove_member(self, user_id: int) -> Optional[Tuple[int, int]]:
+        """공간 멤버 제거 후 (공간 ID, 새 시퀀스 번호) 반환"""
+        space_id = self.user_spaces.pop(user_id, None)
+        if space_id is None:
+            return None
+        
+        members = self.space_users.get(space_id)
+        if members is not None:
+            members.discard(user_id)
+        if not members:
+            # 빈 공간은 시퀀스까지 정리 (다음 입장자는 전체 명단부터 받음)
+            self.space_users.pop(space_id, None)
+            self.space_seq.pop(space_id, None)
+            return None
+        
+        seq = self.space_seq.get(space_id, 0) + 1
+        self.space_seq[space_id] = seq
+        return space_id, seq
+    
+    def _enqueue_left(self, user_id: int, space_id: int, seq: int):
+        self._enqueue_to_space(space_id, json.dumps({
+            "type": "user_left",
+            "user_id": user_id,
+            "space_id": space_id,
+            "seq": seq
+        }))
+    
+    def _enqueue_roster(self, user_id: int, space_id: int):
+        """전체 명단과 현재 시퀀스 번호를 송신 큐에 추가"""
+        if self.user_spaces.get(user_id) != space_id:
+            self._enqueue(json.dumps(error_message("not_in_space")), user_id)
+            return
+        
+        self._enqueue(json.dumps({
+            "type": "space_info",
+            "space_id": space_id,
+            "users_in_space": list(self.space_users[space_id]),
+            "seq": self.space_seq[space_id]
+        }), user_id)
+    
+    async def send_roster(self, user_id: int, space_id: int):
+        """전체 명단과 현재 시퀀스 번호 전송 (입장 시, 재동기화 요청 시)"""
+        self._enqueue_roster(user_id, space_id)
     
     async def join_space(self, user_id: int, space_id: int):
         """사용자가 공간에 입장"""
+        # 정리된 연결의 수신 루프에서 온 요청이면 무시 (채널, 하트비트 없는 멤버가 남지 않도록)
+        if user_id not in self.active_connections:
+            return
+        
+        # 멤버십 변경과 변경분 전송은 await 없이 처리하여 연결별 수신 순서를 시퀀스 순서와 일치시킴
+        # 이미 같은 공간에 있으면 명단만 다시 전송
+        if self.user_spaces.get(user_id) == space_id:
+            self._enqueue_roster(user_id, space_id)
+            return
+        
         # 이전 공간에서 나가기
-        if user_id in self.user_spaces:
-            old_space_id = self.user_spaces[user_id]
-            if old_space_id in self.space_users:
-                self.space_users[old_space_id].discard(user_id)
+        removed = self._remove_member(user_id)
+        if removed is not None:
+            self._enqueue_left(user_id, *removed)
         
         # 새 공간에 입장
-        if space_id not in self.space_users:
-            self.space_users[space_id] = set()
+        seq = self._add_member(user_id, space_id)
         
-        self.space_users[space_id].add(user_id)
-        self.user_spaces[user_id] = space_id
+        # 입장한 사용자에게는 전체 명단을 한 번만 전송
+        self._enqueue_roster(user_id, space_id)
         
-        # 입장 메시지 브로드캐스트
-        join_message = {
+        # 기존 사용자들에게는 추가된 사용자만 전송
+        self._enqueue_to_space(space_id, json.dumps({
             "type": "user_joined",
             "user_id": user_id,
             "space_id": space_id,
-            "users_in_space": list(self.space_users[space_id])
-        }
-        
-        await self.broadcast_to_space(space_id, join_message)
-        
-        # 입장한 사용자에게 현재 공간 정보 전송
-        await self.send_personal_message({
-            "type": "space_info",
-            "space_id": space_id,
-            "users_in_space": list(self.space_users[space_id])
-        }, user_id)
+            "seq": seq
+        }), exclude_user=user_id)
     
     async def leave_space(self, user_id: int):
         """사용자가 공간에서 나감"""
-        if user_id in self.user_spaces:
-            space_id = self.user_spaces[user_id]
-            
-            if space_id in self.space_users:
-                self.space_users[space_id].discard(user_id)
-            
-            del self.user_spaces[user_id]
-            
-            # 나감 메시지 브로드캐스트
-            leave_message = {
-                "type": "user_left",
-                "user_id": user_id,
-                "space_id": space_id,
-                "users_in_space": list(self.space_users.get(space_id, set()))
-            }
-            
-            await self.broadcast_to_space(space_id, leave_message)
+        removed = self._remove_member(user_id)
+        if removed is not None:
+            self._enqueue_left(user_id, *removed)
     
     def get_users_in_space(self, space_id: int) -> List[int]:
         """공간에 있는 사용자 목록 반환"""
-        return list(self.space_users.get(space_id, set()))
+        return list(self.space_users.get(space_id, ()))
     
     def get_user_space(self, user_id: int) -> int:
         """사용자가 접속한 공간 ID 반환"""
@@ -129,3 +337,13 @@ class ConnectionManager:
     def get_connection_count(self) -> int:
         """현재 연결된 사용자 수 반환"""
         return len(self.active_connections)
+    
+    def get_heartbeat_stats(self) -> dict:
+        """하트비트 및 정리된 연결 통계 반환"""
+        return {
+            "tracked": len(self.last_seen),
+            "awaiting_pong": len(self.pinged),
+            "reaped_idle": self.reaped_idle,
+            "reaped_send_error": self.reaped_send_error,
+            "spaces": len(self.space_users),
+        }
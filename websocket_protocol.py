@@ -0,0 +1,215 @@
+import asyncio
+import re
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 메시지 타입별 필수 필드와 허용 타입
+MESSAGE_FIELDS: Dict[str, Dict[str, Tuple[type, ...]]] = {
+    "join_space": {"space_id": (int,)},
+    "leave_space": {},
+    "resync": {"space_id": (int,)},
+    "pong": {},
+    "chat": {"space_id": (int,), "message": (str,)},
+    "move": {"space_id": (int,), "position": (dict, list)},
+}
+
+# JSON 파싱 없이 최상위 "type" 필드를 찾기 위한 토큰 (문자열 전체, 괄호)
+# 문자열을 통째로 건너뛰므로 문자열 내부의 \"type\"이나 괄호는 깊이 계산에 영향 없음
+_TOKEN_PATTERN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+_TYPE_VALUE_PATTERN = re.compile(r'\s*:\s*"([a-z_]{1,32})"')
+
+
+def _find_top_level_type(data: str) -> Optional[str]:
+    """괄호 깊이를 추적하여 최상위 객체의 "type" 값만 추출 (중첩 객체의 "type"은 무시)"""
+    depth = 0
+    for token in _TOKEN_PATTERN.finditer(data):
+        text = token.group()
+        if text == "{" or text == "[":
+            depth += 1
+        elif text == "}" or text == "]":
+            depth -= 1
+        elif depth == 1 and text == '"type"':
+            match = _TYPE_VALUE_PATTERN.match(data, token.end())
+            if match is not None:
+                return match.group(1)
+    return None
+
+
+def prevalidate_frame(data: str, max_size: int) -> Tuple[Optional[str], Optional[str]]:
+    """JSON 파싱 전 간단한 검사로 메시지 타입 추출 (타입, 오류 사유) 반환"""
+    if len(data) > max_size:
+        return None, "message_too_large"
+
+    stripped = data.lstrip()
+    if not stripped.startswith("{"):
+        return None, "malformed"
+
+    message_type = _find_top_level_type(stripped)
+    if message_type is None:
+        return None, "missing_type"
+
+    if message_type not in MESSAGE_FIELDS:
+        return None, "unknown_type"
+
+    return message_type, None
+
+
+def validate_message(message: Any, expected_type: str) -> Optional[str]:
+    """파싱된 메시지의 필드 검증 (문제가 없으면 None 반환)"""
+    if not isinstance(message, dict):
+        return "malformed"
+
+    # 사전 검사에서 추출한 타입과 실제 최상위 타입이 같아야 함
+    if message.get("type") != expected_type:
+        return "type_mismatch"
+
+    for field, allowed_types in MESSAGE_FIELDS[expected_type].items():
+        value = message.get(field)
+        # bool은 int의 하위 클래스이므로 별도로 제외
+        if value is None or isinstance(value, bool) or not isinstance(value, allowed_types):
+            return f"invalid_{field}"
+
+    return None
+
+
+def deflate_negotiated(extensions: str, enabled: bool) -> bool:
+    """전송 계층 permessage-deflate가 협상되었는지 (서버 설정과 클라이언트의 Sec-WebSocket-Extensions 헤더 기준)"""
+    if not enabled:
+        return False
+    return any(offer.split(";")[0].strip().lower() == "permessage-deflate" for offer in extensions.split(","))
+
+
+def error_message(reason: str) -> dict:
+    """클라이언트에 보낼 오류 메시지 생성"""
+    return {"type": "error", "reason": reason}
+
+
+class ProtocolStats:
+    """송신 프레임/바이트 통계 (배칭, 압축 효과 측정용)"""
+
+    def __init__(self):
+        self.events_sent = 0
+        self.frames_sent = 0
+        self.batched_frames = 0
+        self.compressed_frames = 0
+        # 압축 전 원본 바이트와 실제 전송 바이트
+        self.bytes_raw = 0
+        self.bytes_sent = 0
+
+    def record_frame(self, event_count: int, raw_size: int, sent_size: int, compressed: bool):
+        self.events_sent += event_count
+        self.frames_sent += 1
+        if event_count > 1:
+            self.batched_frames += 1
+        if compressed:
+            self.compressed_frames += 1
+        self.bytes_raw += raw_size
+        self.bytes_sent += sent_size
+
+    def get_stats(self) -> dict:
+        """배칭으로 줄어든 프레임(송신 호출) 수와 압축으로 줄어든 바이트 수 반환"""
+        return {
+            "events_sent": self.events_sent,
+            "frames_sent": self.frames_sent,
+            "batched_frames": self.batched_frames,
+            "frames_saved": self.events_sent - self.frames_sent,
+            "compressed_frames": self.compressed_frames,
+            "bytes_raw": self.bytes_raw,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_raw - self.bytes_sent,
+        }
+
+
+class OutboundChannel:
+    """연결별 송신 채널 (순서 보장 송신 큐, 선택적 메시지 배칭 및 크기 기준 압축)
+
+    enqueue()는 동기 함수이므로 호출 순서가 곧 전송 순서다.
+    실제 전송은 연결마다 하나의 flush 태스크가 큐를 비우며 수행한다.
+    """
+
+    def __init__(
+        self,
+        websocket,
+        stats: ProtocolStats,
+        batch_window: float = 0.0,
+        compress_threshold: Optional[int] = None,
+        on_error: Optional[Callable[[Exception], None]] = None,
+        max_pending: int = 1000,
+    ):
+        self.websocket = websocket
+        self.stats = stats
+        # 0이면 배칭하지 않고 메시지마다 프레임 하나씩 전송
+        self.batch_window = batch_window
+        # None이면 압축하지 않음
+        self.compress_threshold = compress_threshold
+        self.on_error = on_error
+        # 느린 클라이언트의 대기열이 무한히 쌓이지 않도록 제한
+        self.max_pending = max_pending
+
+        self.pending: List[str] = []
+        self.flush_task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    def enqueue(self, payload: str):
+        """직렬화된 JSON 메시지를 송신 큐에 추가"""
+        if self.closed:
+            return
+        if len(self.pending) >= self.max_pending:
+            self._fail(OverflowError("송신 대기열이 가득 찼습니다"))
+            return
+
+        self.pending.append(payload)
+        if self.flush_task is None:
+            self.flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            # 전송 중에 추가된 메시지도 같은 태스크에서 순서대로 전송
+            while self.pending and not self.closed:
+                await self.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._fail(e)
+        finally:
+            if self.flush_task is asyncio.current_task():
+                self.flush_task = None
+
+    async def flush(self):
+        """대기 중인 메시지 전송 (배칭 중이면 하나의 배열 프레임으로)"""
+        if not self.pending:
+            return
+        pending = self.pending
+        self.pending = []
+        if self.batch_window > 0:
+            # 이미 직렬화된 메시지를 이어 붙여 재직렬화 없이 배열 생성
+            await self._send_frame("[" + ",".join(pending) + "]", len(pending))
+        else:
+            for payload in pending:
+                await self._send_frame(payload, 1)
+
+    async def _send_frame(self, text: str, event_count: int):
+        raw = text.encode("utf-8")
+        if self.compress_threshold is not None and len(raw) >= self.compress_threshold:
+            compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+            data = compressor.compress(raw) + compressor.flush()
+            await self.websocket.send_bytes(data)
+            self.stats.record_frame(event_count, len(raw), len(data), True)
+        else:
+            await self.websocket.send_text(text)
+            self.stats.record_frame(event_count, len(raw), len(raw), False)
+
+    def _fail(self, error: Exception):
+        self.close()
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def close(self):
+        """대기 중인 메시지와 전송 작업 취소"""
+        self.closed = True
+        self.pending = []
+        if self.flush_task is not None and self.flush_task is not asyncio.current_task():
+            self.flush_task.cancel()
+        self.flush_task = None